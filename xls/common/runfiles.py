@@ -18,13 +18,20 @@ import os
 from typing import Iterable
 
 from rules_python.python.runfiles import runfiles
+from xls.common import memoize
 
 _BASE_PATH = 'com_google_xls'
 
 
+@memoize.memoize
+def _create_runfiles():
+  return runfiles.Create()
+
+
+@memoize.memoize
 def get_path(relpath: str) -> str:
   path = os.path.join(_BASE_PATH, relpath)
-  r = runfiles.Create()
+  r = _create_runfiles()
   runfile_path = r.Rlocation(path)
   if not os.path.exists(runfile_path):
     raise FileNotFoundError(f'Cannot find runfile {relpath}')
@@ -28,6 +28,11 @@ class RunfilesTest(absltest.TestCase):
     self.assertEqual(runfile_contents('xls/common/testdata/foo.txt'), 'FOO\n')
     self.assertEqual(runfile_contents('xls/common/testdata/bar.txt'), 'BAR\n')
 
+  def testGetPathIsMemoized(self):
+    self.assertIs(
+        runfiles.get_path('xls/common/testdata/foo.txt'),
+        runfiles.get_path('xls/common/testdata/foo.txt'))
+
   def testGetContentsAsText(self):
     self.assertEqual(
         runfiles.get_contents_as_text('xls/common/testdata/foo.txt'), 'FOO\n')
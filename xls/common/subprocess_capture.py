@@ -0,0 +1,106 @@
+# Copyright 2024 The XLS Authors
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Helper for running a command to completion and capturing its output."""
+
+import os
+import signal
+import subprocess
+from typing import Optional, Sequence, Union
+
+_PathLike = Union[str, os.PathLike]
+
+# Signals whose dispositions subprocess restores to the default in the child.
+_RESTORED_SIGNALS = tuple(
+    getattr(signal, name)
+    for name in ('SIGPIPE', 'SIGXFZ', 'SIGXFSZ')
+    if hasattr(signal, name)
+)
+
+
+def _read_memfd(fd: int) -> bytes:
+  os.lseek(fd, 0, os.SEEK_SET)
+  return os.read(fd, os.fstat(fd).st_size)
+
+
+def run_captured(
+    args: Sequence[_PathLike],
+    *,
+    stdin: bytes = b'',
+    cwd: Optional[_PathLike] = None,
+) -> subprocess.CompletedProcess:
+  """Runs args to completion, returning its stdout/stderr as bytes.
+
+  Where os.memfd_create() is available (Linux) the child's stdin/stdout/stderr
+  are memfds, so there are no pipes for the parent to drain. If no cwd is given
+  the child is then started with os.posix_spawn() directly, skipping the
+  subprocess bookkeeping; posix_spawn can't change directory, so otherwise it
+  is started through subprocess. The return code is not checked.
+
+  Args:
+    args: Command line to run; args[0] must be an absolute path.
+    stdin: Bytes to feed the command on stdin.
+    cwd: Working directory to run the command in; defaults to the current one.
+
+  Returns:
+    The completion object.
+  """
+  if not hasattr(os, 'memfd_create'):
+    # With an absolute executable path, no cwd and close_fds=False, subprocess
+    # can spawn the child via posix_spawn() (e.g. on macOS) instead of
+    # fork()+exec(). Leaving fds open is safe: everything Python opens is
+    # non-inheritable by default (PEP 446).
+    return subprocess.run(
+        args,
+        input=stdin,
+        cwd=cwd,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+        close_fds=False,
+        check=False,
+    )
+  fds = [os.memfd_create(name) for name in ('stdin', 'stdout', 'stderr')]
+  try:
+    os.write(fds[0], stdin)
+    os.lseek(fds[0], 0, os.SEEK_SET)
+    if cwd is None:
+      pid = os.posix_spawn(
+          args[0],
+          args,
+          os.environ,
+          file_actions=[
+              (os.POSIX_SPAWN_DUP2, fd, target)
+              for target, fd in enumerate(fds)
+          ],
+          # Python ignores these signals; reset them for the child the same
+          # way subprocess does by default (restore_signals=True).
+          setsigdef=_RESTORED_SIGNALS,
+      )
+      _, status = os.waitpid(pid, 0)
+      returncode = os.waitstatus_to_exitcode(status)
+    else:
+      returncode = subprocess.run(
+          args,
+          cwd=cwd,
+          stdin=fds[0],
+          stdout=fds[1],
+          stderr=fds[2],
+          check=False,
+      ).returncode
+    stdout = _read_memfd(fds[1])
+    stderr = _read_memfd(fds[2])
+  finally:
+    for fd in fds:
+      os.close(fd)
+  return subprocess.CompletedProcess(args, returncode, stdout, stderr)
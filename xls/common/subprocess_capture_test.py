@@ -0,0 +1,59 @@
+# Copyright 2024 The XLS Authors
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import os
+import signal
+
+from absl.testing import absltest
+from xls.common import subprocess_capture
+
+_SH = '/bin/sh'
+_PROC_SELF_STATUS = '/proc/self/status'
+
+
+class SubprocessCaptureTest(absltest.TestCase):
+  """Test for subprocess_capture."""
+
+  def testCapturesOutputAndReturnCode(self):
+    result = subprocess_capture.run_captured(
+        [_SH, '-c', 'cat; echo err >&2; exit 3'], stdin=b'in\n'
+    )
+    self.assertEqual(result.returncode, 3)
+    self.assertEqual(result.stdout, b'in\n')
+    self.assertEqual(result.stderr, b'err\n')
+
+  def testRunsInCwd(self):
+    tempdir = self.create_tempdir()
+    result = subprocess_capture.run_captured([_SH, '-c', 'pwd -P'], cwd=tempdir)
+    self.assertEqual(result.returncode, 0)
+    self.assertEqual(
+        result.stdout.decode('utf-8').strip(),
+        os.path.realpath(tempdir.full_path),
+    )
+
+  @absltest.skipUnless(
+      os.path.exists(_PROC_SELF_STATUS), 'needs /proc/self/status'
+  )
+  def testRestoresIgnoredSignals(self):
+    result = subprocess_capture.run_captured(
+        [_SH, '-c', f'grep SigIgn {_PROC_SELF_STATUS}']
+    )
+    self.assertEqual(result.returncode, 0)
+    ignored = int(result.stdout.split()[1], 16)
+    for sig in (signal.SIGPIPE, signal.SIGXFSZ):
+      self.assertFalse(ignored & (1 << (sig - 1)), sig)
+
+
+if __name__ == '__main__':
+  absltest.main()
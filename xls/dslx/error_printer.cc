@@ -149,10 +149,13 @@ absl::Status PrintPositionalError(
   return absl::OkStatus();
 }
 
-void PrintWarnings(const WarningCollector& warnings) {
+void PrintWarnings(
+    const WarningCollector& warnings,
+    std::function<absl::StatusOr<std::string>(std::string_view)>
+        get_file_contents) {
   for (const WarningCollector::Entry& e : warnings.warnings()) {
     absl::Status print_status = PrintPositionalError(
-        e.span, e.message, std::cerr, /*get_file_contents=*/nullptr,
+        e.span, e.message, std::cerr, get_file_contents,
         PositionalErrorColor::kWarningColor);
     if (!print_status.ok()) {
       XLS_LOG(WARNING) << "Could not print warning: " << print_status;
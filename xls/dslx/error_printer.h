@@ -48,7 +48,13 @@ absl::Status PrintPositionalError(
     PositionalErrorColor color, int64_t error_context_line_count = 5);
 
 // Prints warnings to stderr.
-void PrintWarnings(const WarningCollector& warnings);
+//
+// `get_file_contents` is used to retrieve the source text the warnings point
+// into; if it is null, files are read from disk.
+void PrintWarnings(
+    const WarningCollector& warnings,
+    std::function<absl::StatusOr<std::string>(std::string_view)>
+        get_file_contents = nullptr);
 
 }  // namespace xls::dslx
 
@@ -399,15 +399,15 @@ absl::StatusOr<std::string> ConvertOneFunction(
 }
 
 namespace {
-absl::StatusOr<std::unique_ptr<Module>> ParseText(std::string_view text,
-                                                  std::string_view module_name,
-                                                  bool print_on_error,
-                                                  std::string_view filename,
-                                                  bool* printed_error) {
+absl::StatusOr<std::unique_ptr<Module>> ParseText(
+    std::string_view text, std::string_view module_name, bool print_on_error,
+    std::string_view filename, bool* printed_error,
+    const std::function<absl::StatusOr<std::string>(std::string_view)>&
+        get_file_contents) {
   Scanner scanner{std::string(filename), std::string(text)};
   Parser parser(std::string(module_name), &scanner);
   absl::StatusOr<std::unique_ptr<Module>> module_or = parser.ParseModule();
-  *printed_error = TryPrintError(module_or.status());
+  *printed_error = TryPrintError(module_or.status(), get_file_contents);
   return module_or;
 }
 
@@ -430,23 +430,24 @@ absl::Status CheckPackageName(std::string_view name) {
 // now we throw it away for each file and re-derive it (we need to refactor to
 // make the modules outlive any given AddPathToPackage() if we want to
 // appropriately reuse things in ImportData).
-absl::Status AddContentsToPackage(std::string_view file_contents,
-                                  std::string_view module_name,
-                                  std::optional<std::string_view> path,
-                                  std::optional<std::string_view> entry,
-                                  const ConvertOptions& convert_options,
-                                  ImportData* import_data, Package* package,
-                                  bool* printed_error) {
+absl::Status AddContentsToPackage(
+    std::string_view file_contents, std::string_view module_name,
+    std::optional<std::string_view> path, std::optional<std::string_view> entry,
+    const ConvertOptions& convert_options, ImportData* import_data,
+    Package* package, bool* printed_error,
+    const std::function<absl::StatusOr<std::string>(std::string_view)>&
+        get_file_contents) {
   // Parse the module text.
   XLS_ASSIGN_OR_RETURN(
       std::unique_ptr<Module> module,
       ParseText(file_contents, module_name, /*print_on_error=*/true,
-                /*filename=*/path.value_or("<UNKNOWN>"), printed_error));
+                /*filename=*/path.value_or("<UNKNOWN>"), printed_error,
+                get_file_contents));
   WarningCollector warnings(import_data->enabled_warnings());
   absl::StatusOr<TypeInfo*> type_info_or =
       CheckModule(module.get(), import_data, &warnings);
   if (!type_info_or.ok()) {
-    *printed_error = TryPrintError(type_info_or.status());
+    *printed_error = TryPrintError(type_info_or.status(), get_file_contents);
     return type_info_or.status();
   }
 
@@ -454,7 +455,7 @@ absl::Status AddContentsToPackage(std::string_view file_contents,
     if (printed_error != nullptr) {
       *printed_error = true;
     }
-    PrintWarnings(warnings);
+    PrintWarnings(warnings, get_file_contents);
     return absl::InvalidArgumentError(
         "Warnings encountered and warnings-as-errors set.");
   }
@@ -476,7 +477,14 @@ absl::StatusOr<std::unique_ptr<Package>> ConvertFilesToPackage(
     absl::Span<const std::string_view> paths, const std::string& stdlib_path,
     absl::Span<const std::filesystem::path> dslx_paths,
     const ConvertOptions& convert_options, std::optional<std::string_view> top,
-    std::optional<std::string_view> package_name, bool* printed_error) {
+    std::optional<std::string_view> package_name, bool* printed_error,
+    std::function<absl::StatusOr<std::string>(std::string_view)>
+        get_file_contents) {
+  if (get_file_contents == nullptr) {
+    get_file_contents = [](std::string_view path) {
+      return GetFileContents(path);
+    };
+  }
   std::string resolved_package_name;
   if (package_name.has_value()) {
     resolved_package_name = package_name.value();
@@ -501,11 +509,11 @@ absl::StatusOr<std::unique_ptr<Package>> ConvertFilesToPackage(
   for (std::string_view path : paths) {
     ImportData import_data(CreateImportData(stdlib_path, dslx_paths,
                                             convert_options.enabled_warnings));
-    XLS_ASSIGN_OR_RETURN(std::string text, GetFileContents(path));
+    XLS_ASSIGN_OR_RETURN(std::string text, get_file_contents(path));
     XLS_ASSIGN_OR_RETURN(std::string module_name, PathToName(path));
     XLS_RETURN_IF_ERROR(AddContentsToPackage(
         text, module_name, /*path=*/path, /*entry=*/top, convert_options,
-        &import_data, package.get(), printed_error));
+        &import_data, package.get(), printed_error, get_file_contents));
   }
 
   return package;
@@ -15,6 +15,7 @@
 #ifndef XLS_DSLX_IR_CONVERT_IR_CONVERTER_H_
 #define XLS_DSLX_IR_CONVERT_IR_CONVERTER_H_
 
+#include <functional>
 #include <memory>
 #include <optional>
 #include <string>
@@ -102,13 +103,18 @@ absl::Status ConvertOneFunctionIntoPackage(Module* module,
 //   package_name: Optionally, the name of the package.
 //   printed_error: If a non-null pointer is passes, sets the contents to a
 //     boolean value indicating if an error was printed during conversion.
+//   get_file_contents: Optionally, how to retrieve the contents of the files
+//     at paths (and to print errors in them); defaults to reading them from
+//     the filesystem.
 absl::StatusOr<std::unique_ptr<Package>> ConvertFilesToPackage(
     absl::Span<const std::string_view> paths, const std::string& stdlib_path,
     absl::Span<const std::filesystem::path> dslx_paths,
     const ConvertOptions& convert_options,
     std::optional<std::string_view> top = std::nullopt,
     std::optional<std::string_view> package_name = std::nullopt,
-    bool* printed_error = nullptr);
+    bool* printed_error = nullptr,
+    std::function<absl::StatusOr<std::string>(std::string_view)>
+        get_file_contents = nullptr);
 
 }  // namespace xls::dslx
 
@@ -14,20 +14,33 @@
 
 #include <cstdlib>
 #include <filesystem>  // NOLINT
+#include <functional>
 #include <iostream>
 #include <memory>
 #include <optional>
+#include <sstream>
 #include <string>
 #include <string_view>
+#include <utility>
 #include <vector>
 
+#include "absl/container/flat_hash_map.h"
+#include "absl/flags/commandlineflag.h"
 #include "absl/flags/flag.h"
+#include "absl/flags/reflection.h"
 #include "absl/status/status.h"
+#include "absl/status/statusor.h"
+#include "absl/strings/match.h"
+#include "absl/strings/numbers.h"
+#include "absl/strings/str_format.h"
 #include "absl/strings/str_join.h"
 #include "absl/strings/str_split.h"
+#include "absl/strings/strip.h"
 #include "absl/types/span.h"
 #include "xls/common/exit_status.h"
+#include "xls/common/file/filesystem.h"
 #include "xls/common/init_xls.h"
+#include "xls/common/logging/logging.h"
 #include "xls/common/status/status_macros.h"
 #include "xls/dslx/default_dslx_stdlib_path.h"
 #include "xls/dslx/ir_convert/ir_converter.h"
@@ -61,6 +74,12 @@ ABSL_FLAG(bool, warnings_as_errors, true,
           "Whether to fail early, as an error, if warnings are detected");
 // LINT.ThenChange(//xls/build_rules/xls_ir_rules.bzl)
 
+ABSL_FLAG(bool, server, false,
+          "If true, runs as a persistent worker: conversion requests are read "
+          "from stdin and results are written to stdout until stdin is "
+          "closed. Used by tests to amortize process startup across many "
+          "conversions.");
+
 namespace xls::dslx {
 namespace {
 
@@ -79,13 +98,38 @@ If no entry point is given all functions within the module are converted:
   ir_converter_main path/to/frobulator.x
 )";
 
+// Protocol for --server mode (see ServerMain()).
+//
+// On startup the server writes the line kServerReady to stdout. Each request
+// is then two groups of fields, where a group is a line holding a field count N
+// followed by N fields, and every field is a line holding its byte length
+// followed by exactly that many bytes.
+//
+// The first group holds the arguments a one-shot invocation would have
+// received (input paths and --flag=value overrides); conversions run in the
+// server's working directory, and flags are restored after each request, so
+// requests never observe each other's state. Since stdin carries the protocol,
+// "-" is not accepted as an input path. The second group holds alternating
+// path and contents fields for input files that are provided in-memory instead
+// of read from disk.
+//
+// Each response is a line holding the exit code, followed by two fields (same
+// encoding as above) holding what the conversion wrote to std::cout and
+// std::cerr. Only those streams are captured: XLS_LOG/XLS_VLOG output (e.g.
+// from TryPrintError() when an error has no textual position) still goes to
+// the server's own stderr.
+constexpr std::string_view kServerReady = "ready";
+
 absl::Status RealMain(absl::Span<const std::string_view> paths,
                       std::optional<std::string_view> top,
                       std::optional<std::string_view> package_name,
                       const std::string& stdlib_path,
                       absl::Span<const std::filesystem::path> dslx_paths,
                       bool emit_fail_as_assert, bool verify_ir,
-                      bool warnings_as_errors, bool* printed_error) {
+                      bool warnings_as_errors, bool* printed_error,
+                      std::function<absl::StatusOr<std::string>(
+                          std::string_view)>
+                          get_file_contents) {
   XLS_ASSIGN_OR_RETURN(
       WarningKindSet enabled_warnings,
       WarningKindSetFromDisabledString(absl::GetFlag(FLAGS_disable_warnings)));
@@ -97,40 +141,22 @@ absl::Status RealMain(absl::Span<const std::string_view> paths,
       .enabled_warnings = enabled_warnings,
   };
 
-  // The following checks are performed inside ConvertFilesToPackage(), but we
-  // reproduce them here to give nicer error messages.
-  if (!package_name.has_value()) {
-    XLS_QCHECK_EQ(paths.size(), 1)
-        << "-package_name *must* be given when multiple input paths are "
-           "supplied";
-  }
-  if (paths.size() > 1) {
-    XLS_QCHECK(!top.has_value())
-        << "-entry cannot be supplied with multiple input paths (need a single "
-           "input path to know where to resolve the entry function)";
-  }
-
   XLS_ASSIGN_OR_RETURN(
       std::unique_ptr<xls::Package> package,
       ConvertFilesToPackage(paths, stdlib_path, dslx_paths, convert_options,
                             /*top=*/top,
-                            /*package_name=*/package_name, printed_error));
+                            /*package_name=*/package_name, printed_error,
+                            std::move(get_file_contents)));
   std::cout << package->DumpIr();
 
   return absl::OkStatus();
 }
 
-}  // namespace
-}  // namespace xls::dslx
-
-int main(int argc, char* argv[]) {
-  std::vector<std::string_view> args =
-      xls::InitXls(xls::dslx::kUsage, argc, argv);
-  if (args.empty()) {
-    XLS_LOG(QFATAL) << "Wrong number of command-line arguments; got "
-                    << args.size() << ": `" << absl::StrJoin(args, " ")
-                    << "`; want " << argv[0] << " <input-file>";
-  }
+// Converts the given paths using the current flag values, printing the IR to
+// stdout. Returns the process exit code.
+int ConvertPaths(std::vector<std::string_view> args,
+                 std::function<absl::StatusOr<std::string>(std::string_view)>
+                     get_file_contents = nullptr) {
   // "-" is a special path that is shorthand for /dev/stdin. Update here as
   // there isn't a better place later.
   for (auto& arg : args) {
@@ -163,11 +189,187 @@ int main(int argc, char* argv[]) {
   bool verify_ir = absl::GetFlag(FLAGS_verify);
   bool warnings_as_errors = absl::GetFlag(FLAGS_warnings_as_errors);
   bool printed_error = false;
-  absl::Status status = xls::dslx::RealMain(
-      args, top, package_name, stdlib_path, dslx_paths, emit_fail_as_assert,
-      verify_ir, warnings_as_errors, &printed_error);
+  absl::Status status =
+      RealMain(args, top, package_name, stdlib_path, dslx_paths,
+               emit_fail_as_assert, verify_ir, warnings_as_errors,
+               &printed_error, std::move(get_file_contents));
   if (printed_error) {
     return EXIT_FAILURE;
   }
-  return xls::ExitStatus(status);
+  return ExitStatus(status);
+}
+
+// Applies a "--name=value" (or bare "--name" for booleans) argument to the
+// global flag it names. This is deliberately narrower than the real command
+// line parser: "--name value", "--noname" and "--" are rejected rather than
+// interpreted, so server requests can't silently diverge from a one-shot run.
+absl::Status ApplyFlag(std::string_view arg) {
+  std::string_view flag = absl::StripPrefix(absl::StripPrefix(arg, "-"), "-");
+  std::pair<std::string_view, std::string_view> name_value =
+      absl::StrSplit(flag, absl::MaxSplits('=', 1));
+  absl::CommandLineFlag* command_line_flag =
+      absl::FindCommandLineFlag(name_value.first);
+  if (command_line_flag == nullptr) {
+    return absl::InvalidArgumentError(
+        absl::StrFormat("Unknown command line flag '%s'", name_value.first));
+  }
+  std::string value(name_value.second);
+  if (!absl::StrContains(flag, '=')) {
+    if (!command_line_flag->IsOfType<bool>()) {
+      return absl::InvalidArgumentError(
+          absl::StrFormat("Missing value for flag '%s'", name_value.first));
+    }
+    value = "true";
+  }
+  std::string error;
+  if (!command_line_flag->ParseFrom(value, &error)) {
+    return absl::InvalidArgumentError(error);
+  }
+  return absl::OkStatus();
+}
+
+// Runs a single server request with std::cout/std::cerr (but not logging)
+// captured into `out`/`err`. Flag overrides only apply for the duration of the
+// request, and input paths present in `files` are read from there rather than
+// from disk. Returns the exit code a one-shot invocation with the same
+// arguments would have produced.
+int ServeRequest(absl::Span<const std::string> args,
+                 const absl::flat_hash_map<std::string, std::string>& files,
+                 std::string* out, std::string* err) {
+  absl::FlagSaver flag_saver;
+  std::ostringstream out_stream;
+  std::ostringstream err_stream;
+  std::streambuf* cout_buf = std::cout.rdbuf(out_stream.rdbuf());
+  std::streambuf* cerr_buf = std::cerr.rdbuf(err_stream.rdbuf());
+  int exit_code = [&] {
+    std::vector<std::string_view> paths;
+    for (const std::string& arg : args) {
+      if (arg == "-") {
+        return ExitStatus(absl::InvalidArgumentError(
+            "Reading an input from stdin (\"-\") is not supported with "
+            "--server"));
+      }
+      if (arg.size() > 1 && arg[0] == '-') {
+        absl::Status status = ApplyFlag(arg);
+        if (!status.ok()) {
+          return ExitStatus(status);
+        }
+      } else {
+        paths.push_back(arg);
+      }
+    }
+    if (paths.empty()) {
+      return ExitStatus(
+          absl::InvalidArgumentError("No input paths given in request"));
+    }
+    return ConvertPaths(
+        std::move(paths),
+        [&files](std::string_view path) -> absl::StatusOr<std::string> {
+          if (auto it = files.find(path); it != files.end()) {
+            return it->second;
+          }
+          return GetFileContents(path);
+        });
+  }();
+  std::cout.rdbuf(cout_buf);
+  std::cerr.rdbuf(cerr_buf);
+  *out = out_stream.str();
+  *err = err_stream.str();
+  return exit_code;
+}
+
+// Reads a length-prefixed field from `in`. Returns false on EOF or malformed
+// input.
+bool ReadField(std::istream& in, std::string* field) {
+  std::string length_line;
+  size_t length;
+  if (!std::getline(in, length_line) ||
+      !absl::SimpleAtoi(length_line, &length)) {
+    return false;
+  }
+  field->resize(length);
+  return static_cast<bool>(in.read(field->data(), length));
+}
+
+// Reads a group of fields (a count line followed by that many length-prefixed
+// fields) from `in`. Returns false on EOF or malformed input.
+bool ReadFieldGroup(std::istream& in, std::vector<std::string>* fields) {
+  std::string count_line;
+  size_t count;
+  if (!std::getline(in, count_line) || !absl::SimpleAtoi(count_line, &count)) {
+    return false;
+  }
+  fields->resize(count);
+  for (std::string& field : *fields) {
+    if (!ReadField(in, &field)) {
+      return false;
+    }
+  }
+  return true;
+}
+
+void WriteField(std::ostream& out, std::string_view field) {
+  out << field.size() << '\n' << field;
+}
+
+// Serves conversion requests until stdin is closed; see kServerReady for the
+// protocol.
+int ServerMain() {
+  std::cout << kServerReady << std::endl;
+  std::vector<std::string> args;
+  std::vector<std::string> file_fields;
+  while (ReadFieldGroup(std::cin, &args)) {
+    if (!ReadFieldGroup(std::cin, &file_fields) ||
+        file_fields.size() % 2 != 0) {
+      XLS_LOG(ERROR) << "Malformed server request";
+      return EXIT_FAILURE;
+    }
+    absl::flat_hash_map<std::string, std::string> files;
+    for (size_t i = 0; i < file_fields.size(); i += 2) {
+      files[file_fields[i]] = std::move(file_fields[i + 1]);
+    }
+    std::string out;
+    std::string err;
+    int exit_code = ServeRequest(args, files, &out, &err);
+    std::cout << exit_code << '\n';
+    WriteField(std::cout, out);
+    WriteField(std::cout, err);
+    std::cout.flush();
+  }
+  return EXIT_SUCCESS;
+}
+
+}  // namespace
+}  // namespace xls::dslx
+
+int main(int argc, char* argv[]) {
+  std::vector<std::string_view> args =
+      xls::InitXls(xls::dslx::kUsage, argc, argv);
+  if (absl::GetFlag(FLAGS_server)) {
+    if (!args.empty()) {
+      XLS_LOG(QFATAL) << "Input paths are given per request with --server; got "
+                      << "`" << absl::StrJoin(args, " ") << "`";
+    }
+    return xls::dslx::ServerMain();
+  }
+  if (args.empty()) {
+    XLS_LOG(QFATAL) << "Wrong number of command-line arguments; got "
+                    << args.size() << ": `" << absl::StrJoin(args, " ")
+                    << "`; want " << argv[0] << " <input-file>";
+  }
+
+  // The following checks are performed inside ConvertFilesToPackage(), but we
+  // reproduce them here to give nicer error messages.
+  if (absl::GetFlag(FLAGS_package_name).empty()) {
+    XLS_QCHECK_EQ(args.size(), 1)
+        << "-package_name *must* be given when multiple input paths are "
+           "supplied";
+  }
+  if (args.size() > 1) {
+    XLS_QCHECK(absl::GetFlag(FLAGS_top).empty())
+        << "-entry cannot be supplied with multiple input paths (need a single "
+           "input path to know where to resolve the entry function)";
+  }
+
+  return xls::dslx::ConvertPaths(std::move(args));
 }
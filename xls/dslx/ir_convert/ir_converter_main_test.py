@@ -16,20 +16,140 @@
 
 import dataclasses
 import os
+import re
 import subprocess
 import textwrap
-from typing import Dict, Iterable, Optional
+from typing import Dict, Iterable, List, Mapping, Optional, Sequence
 
 from xls.common import runfiles
+from xls.common import subprocess_capture
 from xls.common import test_base
 
 
+# Expected IR for the conversions in the tests below, as bytes so that the
+# converter output never needs decoding.
+_GOLDEN_A = textwrap.dedent("""\
+    package a
+
+    file_number 0 "a.x"
+
+    fn __a__f() -> bits[32] {
+      ret literal.1: bits[32] = literal(value=42, id=1, pos=[(0,0,20)])
+    }
+    """).encode('utf-8')
+_GOLDEN_B = textwrap.dedent("""\
+    package b
+
+    file_number 0 "b.x"
+
+    fn __b__f() -> bits[32] {
+      ret literal.1: bits[32] = literal(value=64, id=1, pos=[(0,0,20)])
+    }
+    """).encode('utf-8')
+_GOLDEN_MULTI = textwrap.dedent("""\
+    package my_entry
+
+    file_number 0 "a.x"
+    file_number 1 "b.x"
+
+    fn __a__f() -> bits[32] {
+      ret literal.1: bits[32] = literal(value=42, id=1, pos=[(0,0,20)])
+    }
+
+    fn __b__f() -> bits[32] {
+      ret literal.2: bits[32] = literal(value=64, id=2, pos=[(1,0,20)])
+    }
+    """).encode('utf-8')
+
+# Error expected when the package name derived from (or given for) the input is
+# not a valid IR identifier.
+_BAD_PACKAGE_NAME_RE = re.compile(
+    rb"package name 'a-name-with-minuses' \(len: 19\) is not a valid"
+    rb' package name'
+)
+
+
 @dataclasses.dataclass
 class ConvertResult:
-  """Result of running the ir_converter_main binary."""
+  """Result of running the ir_converter_main binary (undecoded output)."""
+
+  ir: bytes
+  stderr: bytes
+
+
+class _ConverterServer:
+  """Persistent `ir_converter_main --server` process.
+
+  Amortizes the binary's startup cost across all the conversions in a test
+  class; see the protocol description in ir_converter_main.cc.
+  """
+
+  _READY = b'ready\n'
 
-  ir: str
-  stderr: str
+  def __init__(self, proc: subprocess.Popen):
+    self._proc = proc
+
+  @classmethod
+  def start(cls, path: str) -> Optional['_ConverterServer']:
+    """Starts the server, or returns None if the binary doesn't support it."""
+    proc = subprocess.Popen(
+        [path, '--server'],
+        stdin=subprocess.PIPE,
+        stdout=subprocess.PIPE,
+    )
+    if proc.stdout.readline() != cls._READY:
+      proc.stdin.close()
+      proc.stdout.close()
+      proc.wait()
+      return None
+    return cls(proc)
+
+  def _read_field(self) -> bytes:
+    length = int(self._proc.stdout.readline())
+    return self._proc.stdout.read(length)
+
+  @staticmethod
+  def _encode_field_group(request: List[bytes], fields: Sequence[str]) -> None:
+    request.append(b'%d\n' % len(fields))
+    for field in fields:
+      data = field.encode('utf-8')
+      request.append(b'%d\n' % len(data))
+      request.append(data)
+
+  def run(
+      self,
+      args: Sequence[str],
+      files: Mapping[str, str],
+  ) -> subprocess.CompletedProcess:
+    """Runs a conversion as if `args` had been given to a one-shot binary.
+
+    Args:
+      args: Input paths and flags.
+      files: Contents of input paths that should not be read from disk.
+
+    Returns:
+      The outcome of the conversion.
+    """
+    request = []
+    self._encode_field_group(request, args)
+    self._encode_field_group(
+        request, [field for item in files.items() for field in item]
+    )
+    self._proc.stdin.write(b''.join(request))
+    self._proc.stdin.flush()
+    returncode_line = self._proc.stdout.readline()
+    if not returncode_line:
+      raise RuntimeError('ir_converter_main server exited unexpectedly')
+    stdout = self._read_field()
+    stderr = self._read_field()
+    return subprocess.CompletedProcess(
+        args, int(returncode_line), stdout=stdout, stderr=stderr
+    )
+
+  def stop(self) -> None:
+    self._proc.stdin.close()
+    self._proc.stdout.close()
+    self._proc.wait()
 
 
 class IrConverterMainTest(test_base.TestCase):
@@ -39,33 +159,51 @@ class IrConverterMainTest(test_base.TestCase):
       'xls/dslx/ir_convert/ir_converter_main'
   )
 
+  @classmethod
+  def setUpClass(cls):
+    super().setUpClass()
+    cls._server = _ConverterServer.start(cls.IR_CONVERTER_MAIN_PATH)
+
+  @classmethod
+  def tearDownClass(cls):
+    if cls._server is not None:
+      cls._server.stop()
+    super().tearDownClass()
+
   def _ir_convert(
       self,
       dslx_contents: Dict[str, str],
       package_name: Optional[str] = None,
       *,
       extra_flags: Iterable[str] = (),
+      use_server: bool = True,
       expect_zero_exit: bool = True,
   ) -> ConvertResult:
-    tempdir = self.create_tempdir()
-    tempfiles = []
-    for filename, contents in dslx_contents.items():
-      path = os.path.join(tempdir, filename)
-      with open(path, 'w') as f:
-        f.write(contents)
-      tempfiles.append(filename)
-    cmd = [self.IR_CONVERTER_MAIN_PATH] + tempfiles
-    if package_name is not None:
-      cmd.append('--package_name=' + package_name)
-    cmd.extend(extra_flags)
-    out = subprocess.run(
-        cmd,
-        encoding='utf-8',
-        cwd=tempdir,
-        stdout=subprocess.PIPE,
-        stderr=subprocess.PIPE,
-        check=False,
+    extra_flags = tuple(extra_flags)
+    package_flags = (
+        () if package_name is None else ('--package_name=' + package_name,)
     )
+    args = [*dslx_contents, *package_flags, *extra_flags]
+    # The server takes the DSLX contents in-memory, but it only understands the
+    # `--name=value` flag syntax, so anything with extra flags (where the
+    # parsing of the real command line matters) runs the binary itself.
+    if use_server and self._server is not None and not extra_flags:
+      out = self._server.run(args, dslx_contents)
+    else:
+      tempdir = self.create_tempdir()
+      for filename, contents in dslx_contents.items():
+        fd = os.open(
+            os.path.join(tempdir, filename),
+            os.O_WRONLY | os.O_CREAT | os.O_TRUNC,
+            0o600,
+        )
+        try:
+          os.write(fd, contents.encode('utf-8'))
+        finally:
+          os.close(fd)
+      out = subprocess_capture.run_captured(
+          [self.IR_CONVERTER_MAIN_PATH, *args], cwd=tempdir.full_path
+      )
     if expect_zero_exit:
       out.check_returncode()
     return ConvertResult(ir=out.stdout, stderr=out.stderr)
@@ -76,11 +214,7 @@ class IrConverterMainTest(test_base.TestCase):
         expect_zero_exit=False,
     )
     self.assertEmpty(result.ir)
-    self.assertRegex(
-        result.stderr,
-        r"package name 'a-name-with-minuses' \(len: 19\) is not a valid package"
-        r' name',
-    )
+    self.assertRegex(result.stderr, _BAD_PACKAGE_NAME_RE)
 
   def test_bad_package_name_given(self) -> None:
     result = self._ir_convert(
@@ -89,59 +223,57 @@ class IrConverterMainTest(test_base.TestCase):
         expect_zero_exit=False,
     )
     self.assertEmpty(result.ir)
-    self.assertRegex(
+    self.assertRegex(result.stderr, _BAD_PACKAGE_NAME_RE)
+
+  def test_warning_as_error(self) -> None:
+    result = self._ir_convert(
+        {'a.x': 'fn f() -> u32 { let x = u32:1; u32:42 }'},
+        expect_zero_exit=False,
+    )
+    self.assertEmpty(result.ir)
+    self.assertIn(
+        b'Definition of `x` (type `uN[32]`) is not used in function `f`',
         result.stderr,
-        r"package name 'a-name-with-minuses' \(len: 19\) is not a valid package"
-        r' name',
     )
+    # The server only has the source in memory, so this checks that the warning
+    # is printed from there.
+    self.assertIn(b'let x = u32:1;', result.stderr)
 
   def test_a_dot_x(self) -> None:
-    self.assertEqual(
-        self._ir_convert({'a.x': self.A_DOT_X}).ir,
-        textwrap.dedent("""\
-    package a
+    self.assertEqual(self._ir_convert({'a.x': self.A_DOT_X}).ir, _GOLDEN_A)
 
-    file_number 0 "a.x"
+  def test_b_dot_x(self) -> None:
+    self.assertEqual(self._ir_convert({'b.x': self.B_DOT_X}).ir, _GOLDEN_B)
 
-    fn __a__f() -> bits[32] {
-      ret literal.1: bits[32] = literal(value=42, id=1, pos=[(0,0,20)])
-    }
-    """),
+  def test_a_dot_x_one_shot(self) -> None:
+    self.assertEqual(
+        self._ir_convert({'a.x': self.A_DOT_X}, use_server=False).ir, _GOLDEN_A
     )
 
-  def test_b_dot_x(self) -> None:
+  def test_multi_file_one_shot(self) -> None:
     self.assertEqual(
-        self._ir_convert({'b.x': self.B_DOT_X}).ir,
-        textwrap.dedent("""\
-    package b
-
-    file_number 0 "b.x"
+        self._ir_convert(
+            {'a.x': self.A_DOT_X, 'b.x': self.B_DOT_X},
+            extra_flags=['--package_name', 'my_entry'],
+        ).ir,
+        _GOLDEN_MULTI,
+    )
 
-    fn __b__f() -> bits[32] {
-      ret literal.1: bits[32] = literal(value=64, id=1, pos=[(0,0,20)])
-    }
-    """),
+  def test_multi_file_without_package_name(self) -> None:
+    result = self._ir_convert(
+        {'a.x': self.A_DOT_X, 'b.x': self.B_DOT_X},
+        use_server=False,
+        expect_zero_exit=False,
     )
+    self.assertEmpty(result.ir)
+    self.assertIn(b'-package_name *must* be given', result.stderr)
 
   def test_multi_file(self) -> None:
     self.assertEqual(
         self._ir_convert(
             {'a.x': self.A_DOT_X, 'b.x': self.B_DOT_X}, package_name='my_entry'
         ).ir,
-        textwrap.dedent("""\
-    package my_entry
-
-    file_number 0 "a.x"
-    file_number 1 "b.x"
-
-    fn __a__f() -> bits[32] {
-      ret literal.1: bits[32] = literal(value=42, id=1, pos=[(0,0,20)])
-    }
-
-    fn __b__f() -> bits[32] {
-      ret literal.2: bits[32] = literal(value=64, id=2, pos=[(1,0,20)])
-    }
-    """),
+        _GOLDEN_MULTI,
     )
 
 
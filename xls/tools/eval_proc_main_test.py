@@ -13,16 +13,50 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
-import subprocess
+import os
+import shutil
+import sys
+import tempfile
 import textwrap
 
 from absl import logging
 
 from xls.common import runfiles
+from xls.common import subprocess_capture
 from absl.testing import absltest
+from absl.testing import parameterized
 
 EVAL_PROC_MAIN_PATH = runfiles.get_path("xls/tools/eval_proc_main")
 
+# Backends that can evaluate a proc network; each backend run is its own test
+# case so that they can be spread across shards.
+PROC_BACKENDS = ("ir_interpreter", "serial_jit")
+
+# Path that makes eval_proc_main read its IR from stdin (see run_command).
+STDIN_PATH = "/dev/stdin"
+
+# Memory-backed filesystem used for class-scoped files when available.
+TMPFS_PATH = "/dev/shm"
+
+# Per-channel inputs and expected outputs shared by most tests; written once in
+# setUpClass.
+IN_CH_VALUES = textwrap.dedent("""
+    bits[64]:42
+    bits[64]:101
+""")
+IN_CH_2_VALUES = textwrap.dedent("""
+    bits[64]:10
+    bits[64]:6
+""")
+OUT_CH_VALUES = textwrap.dedent("""
+    bits[64]:62
+    bits[64]:127
+""")
+OUT_CH_2_VALUES = textwrap.dedent("""
+    bits[64]:55
+    bits[64]:55
+""")
+
 PROC_IR = """package foo
 
 chan in_ch(bits[64], id=1, kind=streaming, ops=receive_only, flow_control=ready_valid, metadata=\"\"\"\"\"\")
@@ -348,224 +382,158 @@ BLOCK_MEMORY_SIGNATURE_PATH = runfiles.get_path(
 )
 
 
-def run_command(args):
-  """Runs the command described by args and returns the completion object."""
+def class_tmpdir_root():
+  """Returns the directory to hold files shared by all tests in a class.
+
+  These small files are read by every test, so they are placed on tmpfs
+  (/dev/shm) when it is available to skip filesystem journaling; otherwise
+  they go in the test's usual temporary directory.
+  """
+  if sys.platform.startswith("linux") and os.access(TMPFS_PATH, os.W_OK):
+    return TMPFS_PATH
+  return absltest.get_default_test_tmpdir()
+
+
+def run_command(args, stdin_text=None):
+  """Runs the command described by args and returns the completion object.
+
+  The child's stdout/stderr are returned as bytes; tests match against them
+  directly so that (potentially large, with -v=3) output is never decoded.
+
+  Args:
+    args: Command line to run; args[0] must be an absolute path.
+    stdin_text: Optional text to feed the command on stdin, e.g. IR passed via
+      STDIN_PATH to avoid writing it to a temporary file.
+  """
   # Don't use check=True because we want to print stderr/stdout on failure for a
   # better error message.
-  # pylint: disable=subprocess-run-check
-  comp = subprocess.run(
-      args, stdout=subprocess.PIPE, stderr=subprocess.PIPE, encoding="utf-8")
+  stdin = b"" if stdin_text is None else stdin_text.encode("utf-8")
+  comp = subprocess_capture.run_captured(args, stdin=stdin)
   if comp.returncode != 0:
     logging.error("Failed to run: %s", " ".join(args))
-    logging.error("stderr: %s", comp.stderr)
-    logging.error("stdout: %s", comp.stdout)
-  comp.check_returncode()
+    logging.error("stderr: %s", comp.stderr.decode("utf-8", "replace"))
+    logging.error("stdout: %s", comp.stdout.decode("utf-8", "replace"))
+    comp.check_returncode()
   return comp
 
 
-class EvalProcTest(absltest.TestCase):
-
-  def test_basic(self):
-    ir_file = self.create_tempfile(content=PROC_IR)
-    input_file = self.create_tempfile(
-        content=textwrap.dedent("""
-          bits[64]:42
-          bits[64]:101
-        """))
-    input_file_2 = self.create_tempfile(
-        content=textwrap.dedent("""
-          bits[64]:10
-          bits[64]:6
-        """))
-    output_file = self.create_tempfile(
-        content=textwrap.dedent("""
-          bits[64]:62
-          bits[64]:127
-        """))
-    output_file_2 = self.create_tempfile(
-        content=textwrap.dedent("""
-          bits[64]:55
-          bits[64]:55
-        """))
-
-    shared_args = [
-        EVAL_PROC_MAIN_PATH, ir_file.full_path, "--ticks", "2", "-v=3",
-        "--show_trace",
-        "--logtostderr", "--inputs_for_channels",
-        "in_ch={infile1},in_ch_2={infile2}".format(
-            infile1=input_file.full_path,
-            infile2=input_file_2.full_path), "--expected_outputs_for_channels",
-        "out_ch={outfile},out_ch_2={outfile2}".format(
-            outfile=output_file.full_path, outfile2=output_file_2.full_path)
+class EvalProcTest(parameterized.TestCase):
+
+  @classmethod
+  def setUpClass(cls):
+    super().setUpClass()
+    # The directory may be outside of TEST_TMPDIR (see class_tmpdir_root), so
+    # register its removal immediately; class cleanups also run if the rest of
+    # setUpClass fails.
+    cls._class_tempdir = tempfile.mkdtemp(
+        prefix="xls_eval_proc_main_test_", dir=class_tmpdir_root())
+    cls.addClassCleanup(shutil.rmtree, cls._class_tempdir, ignore_errors=True)
+    cls.in_ch_path = cls._write_class_tempfile("in_ch", IN_CH_VALUES)
+    cls.in_ch_2_path = cls._write_class_tempfile("in_ch_2", IN_CH_2_VALUES)
+    cls.out_ch_path = cls._write_class_tempfile("out_ch", OUT_CH_VALUES)
+    cls.out_ch_2_path = cls._write_class_tempfile("out_ch_2", OUT_CH_2_VALUES)
+
+  @classmethod
+  def _write_class_tempfile(cls, name, content):
+    """Writes a file shared by all tests in the class and returns its path."""
+    path = os.path.join(cls._class_tempdir, name)
+    fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+    try:
+      os.write(fd, content.encode("utf-8"))
+    finally:
+      os.close(fd)
+    return path
+
+  def _proc_channel_args(self, ticks, out_ch_path, out_ch_2_path):
+    """Returns the eval_proc_main args shared by the per-channel PROC_IR tests.
+
+    The IR is read from stdin, inputs come from the class-scoped in_ch/in_ch_2
+    files and outputs are checked against the given files.
+
+    Args:
+      ticks: Value for --ticks.
+      out_ch_path: File with the expected out_ch values.
+      out_ch_2_path: File with the expected out_ch_2 values.
+    """
+    return [
+        EVAL_PROC_MAIN_PATH, STDIN_PATH, "--ticks", ticks, "-v=3",
+        "--show_trace", "--logtostderr", "--inputs_for_channels",
+        f"in_ch={self.in_ch_path},in_ch_2={self.in_ch_2_path}",
+        "--expected_outputs_for_channels",
+        f"out_ch={out_ch_path},out_ch_2={out_ch_2_path}"
     ]
 
-    output = run_command(shared_args + ["--backend", "ir_interpreter"])
-    self.assertIn("Proc test_proc", output.stderr)
+  @parameterized.parameters(*PROC_BACKENDS)
+  def test_basic(self, backend):
+    shared_args = self._proc_channel_args(
+        "2", self.out_ch_path, self.out_ch_2_path)
 
-    output = run_command(shared_args + ["--backend", "serial_jit"])
-    self.assertIn("Proc test_proc", output.stderr)
+    output = run_command(shared_args + ["--backend", backend], PROC_IR)
+    self.assertIn(b"Proc test_proc", output.stderr)
 
-  def test_basic_run_until_completed(self):
-    ir_file = self.create_tempfile(content=PROC_IR)
-    input_file = self.create_tempfile(
-        content=textwrap.dedent("""
-          bits[64]:42
-          bits[64]:101
-        """))
-    input_file_2 = self.create_tempfile(
-        content=textwrap.dedent("""
-          bits[64]:10
-          bits[64]:6
-        """))
-    output_file = self.create_tempfile(
-        content=textwrap.dedent("""
-          bits[64]:62
-          bits[64]:127
-        """))
-    output_file_2 = self.create_tempfile(
-        content=textwrap.dedent("""
-          bits[64]:55
-          bits[64]:55
-        """))
+  @parameterized.parameters(*PROC_BACKENDS)
+  def test_basic_run_until_completed(self, backend):
+    shared_args = self._proc_channel_args(
+        "-1", self.out_ch_path, self.out_ch_2_path)
 
-    shared_args = [
-        EVAL_PROC_MAIN_PATH, ir_file.full_path, "--ticks", "-1", "-v=3",
-        "--show_trace",
-        "--logtostderr", "--inputs_for_channels",
-        "in_ch={infile1},in_ch_2={infile2}".format(
-            infile1=input_file.full_path,
-            infile2=input_file_2.full_path), "--expected_outputs_for_channels",
-        "out_ch={outfile},out_ch_2={outfile2}".format(
-            outfile=output_file.full_path, outfile2=output_file_2.full_path)
-    ]
-
-    output = run_command(shared_args + ["--backend", "ir_interpreter"])
-    self.assertIn("Proc test_proc", output.stderr)
-
-    output = run_command(shared_args + ["--backend", "serial_jit"])
-    self.assertIn("Proc test_proc", output.stderr)
+    output = run_command(shared_args + ["--backend", backend], PROC_IR)
+    self.assertIn(b"Proc test_proc", output.stderr)
 
-  def test_reset_static(self):
-    ir_file = self.create_tempfile(content=PROC_IR)
-    input_file = self.create_tempfile(
-        content=textwrap.dedent("""
-          bits[64]:42
-          bits[64]:101
-        """))
-    input_file_2 = self.create_tempfile(
-        content=textwrap.dedent("""
-          bits[64]:10
-          bits[64]:6
-        """))
+  @parameterized.parameters(*PROC_BACKENDS)
+  def test_reset_static(self, backend):
     output_file = self.create_tempfile(
         content=textwrap.dedent("""
           bits[64]:62
           bits[64]:117
         """))
-    output_file_2 = self.create_tempfile(
-        content=textwrap.dedent("""
-          bits[64]:55
-          bits[64]:55
-        """))
-
-    shared_args = [
-        EVAL_PROC_MAIN_PATH, ir_file.full_path, "--ticks", "1,1", "-v=3",
-        "--show_trace",
-        "--logtostderr", "--inputs_for_channels",
-        "in_ch={infile1},in_ch_2={infile2}".format(
-            infile1=input_file.full_path,
-            infile2=input_file_2.full_path), "--expected_outputs_for_channels",
-        "out_ch={outfile},out_ch_2={outfile2}".format(
-            outfile=output_file.full_path, outfile2=output_file_2.full_path)
-    ]
 
-    output = run_command(shared_args + ["--backend", "ir_interpreter"])
-    self.assertIn("Proc test_proc", output.stderr)
+    shared_args = self._proc_channel_args(
+        "1,1", output_file.full_path, self.out_ch_2_path)
 
-    output = run_command(shared_args + ["--backend", "serial_jit"])
-    self.assertIn("Proc test_proc", output.stderr)
+    output = run_command(shared_args + ["--backend", backend], PROC_IR)
+    self.assertIn(b"Proc test_proc", output.stderr)
 
   def test_block(self):
     ir_file = self.create_tempfile(content=BLOCK_IR)
     signature_file = self.create_tempfile(content=BLOCK_SIGNATURE_TEXT)
-    input_file = self.create_tempfile(
-        content=textwrap.dedent("""
-          bits[64]:42
-          bits[64]:101
-        """))
-    input_file_2 = self.create_tempfile(
-        content=textwrap.dedent("""
-          bits[64]:10
-          bits[64]:6
-        """))
-    output_file = self.create_tempfile(
-        content=textwrap.dedent("""
-          bits[64]:62
-          bits[64]:127
-        """))
-    output_file_2 = self.create_tempfile(
-        content=textwrap.dedent("""
-          bits[64]:55
-          bits[64]:55
-        """))
 
     shared_args = [
         EVAL_PROC_MAIN_PATH, ir_file.full_path, "--ticks", "2", "--show_trace",
         "--logtostderr", "--block_signature_proto", signature_file.full_path,
         "--backend", "block_interpreter", "--inputs_for_channels",
         "in_ch={infile1},in_ch_2={infile2}".format(
-            infile1=input_file.full_path,
-            infile2=input_file_2.full_path), "--expected_outputs_for_channels",
+            infile1=self.in_ch_path,
+            infile2=self.in_ch_2_path), "--expected_outputs_for_channels",
         "out_ch={outfile},out_ch_2={outfile2}".format(
-            outfile=output_file.full_path, outfile2=output_file_2.full_path),
+            outfile=self.out_ch_path, outfile2=self.out_ch_2_path),
         "--show_trace"
     ]
 
     output = run_command(shared_args)
-    self.assertIn("Cycle[6]: resetting? false", output.stderr)
+    self.assertIn(b"Cycle[6]: resetting? false", output.stderr)
 
-    self.assertIn("trace: rst_n 0", output.stderr)
-    self.assertIn("trace: rst_n 1", output.stderr)
+    self.assertIn(b"trace: rst_n 0", output.stderr)
+    self.assertIn(b"trace: rst_n 1", output.stderr)
 
   def test_block_run_until_consumed(self):
     ir_file = self.create_tempfile(content=BLOCK_IR)
     signature_file = self.create_tempfile(content=BLOCK_SIGNATURE_TEXT)
     stats_file = self.create_tempfile(content="")
-    input_file = self.create_tempfile(
-        content=textwrap.dedent("""
-          bits[64]:42
-          bits[64]:101
-        """))
-    input_file_2 = self.create_tempfile(
-        content=textwrap.dedent("""
-          bits[64]:10
-          bits[64]:6
-        """))
-    output_file = self.create_tempfile(
-        content=textwrap.dedent("""
-          bits[64]:62
-          bits[64]:127
-        """))
-    output_file_2 = self.create_tempfile(
-        content=textwrap.dedent("""
-          bits[64]:55
-          bits[64]:55
-        """))
 
     shared_args = [
         EVAL_PROC_MAIN_PATH, ir_file.full_path, "--ticks", "-1", "--show_trace",
         "--logtostderr", "--block_signature_proto", signature_file.full_path,
         "--backend", "block_interpreter", "--inputs_for_channels",
         "in_ch={infile1},in_ch_2={infile2}".format(
-            infile1=input_file.full_path,
-            infile2=input_file_2.full_path), "--expected_outputs_for_channels",
+            infile1=self.in_ch_path,
+            infile2=self.in_ch_2_path), "--expected_outputs_for_channels",
         "out_ch={outfile},out_ch_2={outfile2}".format(
-            outfile=output_file.full_path, outfile2=output_file_2.full_path),
+            outfile=self.out_ch_path, outfile2=self.out_ch_2_path),
         "--output_stats_path", stats_file.full_path
     ]
 
     output = run_command(shared_args)
-    self.assertIn("Cycle[6]: resetting? false", output.stderr)
+    self.assertIn(b"Cycle[6]: resetting? false", output.stderr)
 
     with open(stats_file.full_path, "r") as f:
       stats_content = f.read()
@@ -574,26 +542,6 @@ class EvalProcTest(absltest.TestCase):
   def test_block_no_output(self):
     ir_file = self.create_tempfile(content=BLOCK_IR_BROKEN)
     signature_file = self.create_tempfile(content=BLOCK_SIGNATURE_TEXT)
-    input_file = self.create_tempfile(
-        content=textwrap.dedent("""
-          bits[64]:42
-          bits[64]:101
-        """))
-    input_file_2 = self.create_tempfile(
-        content=textwrap.dedent("""
-          bits[64]:10
-          bits[64]:6
-        """))
-    output_file = self.create_tempfile(
-        content=textwrap.dedent("""
-          bits[64]:62
-          bits[64]:127
-        """))
-    output_file_2 = self.create_tempfile(
-        content=textwrap.dedent("""
-          bits[64]:55
-          bits[64]:55
-        """))
 
     shared_args = [
         EVAL_PROC_MAIN_PATH, ir_file.full_path, "--ticks", "2", "-v=3",
@@ -601,23 +549,18 @@ class EvalProcTest(absltest.TestCase):
         "--logtostderr", "--block_signature_proto", signature_file.full_path,
         "--backend", "block_interpreter", "--inputs_for_channels",
         "in_ch={infile1},in_ch_2={infile2}".format(
-            infile1=input_file.full_path,
-            infile2=input_file_2.full_path), "--expected_outputs_for_channels",
+            infile1=self.in_ch_path,
+            infile2=self.in_ch_2_path), "--expected_outputs_for_channels",
         "out_ch={outfile},out_ch_2={outfile2}".format(
-            outfile=output_file.full_path, outfile2=output_file_2.full_path)
+            outfile=self.out_ch_path, outfile2=self.out_ch_2_path)
     ]
 
-    comp = subprocess.run(
-        shared_args,
-        stdout=subprocess.PIPE,
-        stderr=subprocess.PIPE,
-        encoding="utf-8",
-        check=False)
+    comp = subprocess_capture.run_captured(shared_args)
     self.assertNotEqual(comp.returncode, 0)
-    self.assertIn("Block didn't produce output", comp.stderr)
+    self.assertIn(b"Block didn't produce output", comp.stderr)
 
-  def test_all_channels_in_a_single_file_proc(self):
-    ir_file = self.create_tempfile(content=PROC_IR)
+  @parameterized.parameters(*PROC_BACKENDS)
+  def test_all_channels_in_a_single_file_proc(self, backend):
     input_file = self.create_tempfile(
         content=textwrap.dedent("""
           in_ch : {
@@ -642,17 +585,14 @@ class EvalProcTest(absltest.TestCase):
         """))
 
     shared_args = [
-        EVAL_PROC_MAIN_PATH, ir_file.full_path, "--ticks", "2", "-v=3",
+        EVAL_PROC_MAIN_PATH, STDIN_PATH, "--ticks", "2", "-v=3",
         "--show_trace",
         "--logtostderr", "--inputs_for_all_channels", input_file.full_path,
         "--expected_outputs_for_all_channels", output_file.full_path
     ]
 
-    output = run_command(shared_args + ["--backend", "ir_interpreter"])
-    self.assertIn("Proc test_proc", output.stderr)
-
-    output = run_command(shared_args + ["--backend", "serial_jit"])
-    self.assertIn("Proc test_proc", output.stderr)
+    output = run_command(shared_args + ["--backend", backend], PROC_IR)
+    self.assertIn(b"Proc test_proc", output.stderr)
 
   def test_all_channels_in_a_single_file_block(self):
     ir_file = self.create_tempfile(content=BLOCK_IR)
@@ -690,10 +630,10 @@ class EvalProcTest(absltest.TestCase):
     ]
 
     output = run_command(shared_args)
-    self.assertIn("Cycle[6]: resetting? false", output.stderr)
+    self.assertIn(b"Cycle[6]: resetting? false", output.stderr)
 
-  def test_output_channels_stdout_display_proc(self):
-    ir_file = self.create_tempfile(content=PROC_IR)
+  @parameterized.parameters(*PROC_BACKENDS)
+  def test_output_channels_stdout_display_proc(self, backend):
     input_file = self.create_tempfile(
         content=textwrap.dedent("""
           in_ch : {
@@ -707,23 +647,18 @@ class EvalProcTest(absltest.TestCase):
         """))
 
     shared_args = [
-        EVAL_PROC_MAIN_PATH, ir_file.full_path, "--ticks", "2", "-v=3",
+        EVAL_PROC_MAIN_PATH, STDIN_PATH, "--ticks", "2", "-v=3",
         "--show_trace",
         "--logtostderr", "--inputs_for_all_channels", input_file.full_path
     ]
 
-    output = run_command(shared_args + ["--backend", "ir_interpreter"])
-    self.assertIn("Proc test_proc", output.stderr)
-    self.assertIn("out_ch : {", output.stdout)
-    self.assertIn("out_ch_2 : {", output.stdout)
+    output = run_command(shared_args + ["--backend", backend], PROC_IR)
+    self.assertIn(b"Proc test_proc", output.stderr)
+    self.assertIn(b"out_ch : {", output.stdout)
+    self.assertIn(b"out_ch_2 : {", output.stdout)
 
-    output = run_command(shared_args + ["--backend", "serial_jit"])
-    self.assertIn("Proc test_proc", output.stderr)
-    self.assertIn("out_ch : {", output.stdout)
-    self.assertIn("out_ch_2 : {", output.stdout)
-
-  def test_output_channels_with_no_values_stdout_display_proc(self):
-    ir_file = self.create_tempfile(content=PROC_IR_CONDITIONAL)
+  @parameterized.parameters(*PROC_BACKENDS)
+  def test_output_channels_with_no_values_stdout_display_proc(self, backend):
     input_file = self.create_tempfile(
         content=textwrap.dedent("""
           input : {
@@ -735,18 +670,15 @@ class EvalProcTest(absltest.TestCase):
         """))
 
     shared_args = [
-        EVAL_PROC_MAIN_PATH, ir_file.full_path, "--ticks", "4", "-v=3",
+        EVAL_PROC_MAIN_PATH, STDIN_PATH, "--ticks", "4", "-v=3",
         "--show_trace",
         "--logtostderr", "--inputs_for_all_channels", input_file.full_path
     ]
 
-    output = run_command(shared_args + ["--backend", "ir_interpreter"])
-    self.assertIn("Proc test_proc", output.stderr)
-    self.assertIn("output : {\n}", output.stdout)
-
-    output = run_command(shared_args + ["--backend", "serial_jit"])
-    self.assertIn("Proc test_proc", output.stderr)
-    self.assertIn("output : {\n}", output.stdout)
+    output = run_command(
+        shared_args + ["--backend", backend], PROC_IR_CONDITIONAL)
+    self.assertIn(b"Proc test_proc", output.stderr)
+    self.assertIn(b"output : {\n}", output.stdout)
 
   def test_block_memory(self):
     ir_file = BLOCK_MEMORY_IR_PATH
@@ -793,10 +725,10 @@ class EvalProcTest(absltest.TestCase):
 
     output = run_command(shared_args)
     self.assertIn(
-        "Channel Model: Consuming output for out: bits[32]:13", output.stderr
+        b"Channel Model: Consuming output for out: bits[32]:13", output.stderr
     )
     self.assertIn(
-        "Memory Model: Initiated read mem[3] = bits[32]:6", output.stderr
+        b"Memory Model: Initiated read mem[3] = bits[32]:6", output.stderr
     )
 
 